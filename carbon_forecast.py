@@ -0,0 +1,228 @@
+import bisect
+import csv
+import os
+from datetime import datetime
+
+# Store delle previsioni di intensità carbonica su orizzonte lungo
+# (es. 48–288 slot al giorno).
+#
+# I file possono essere:
+# - serie con timestamp, con header "timestamp,intensity" (ISO 8601 o epoch);
+# - il vecchio formato co2.csv: una sola riga di interi separati da virgola.
+#
+# Con serie con timestamp il tick t corrisponde all'istante
+# forecast_start + t * slot_minutes: la finestra legge il valore in vigore a
+# quell'istante (ultimo punto ≤ istante), quindi aggiornamenti rolling, file
+# con risoluzioni diverse o con buchi restano allineati al clock.
+# Il formato storico non ha timestamp: lo slot i è il tick i e il profilo si
+# ripete (i % n). Se sono configurate anche serie con timestamp, i file
+# storici vengono ignorati.
+
+
+def _parse_timestamp(value):
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _parse_intensity(value):
+    # Il modello CP-SAT richiede coefficienti interi
+    return int(round(float(value)))
+
+
+def load_forecast_file(path):
+    """
+    Legge un file di previsione.
+
+    Ritorna (timestamped, points): points è la lista di coppie
+    (timestamp, intensità); per il formato storico i timestamp sono le
+    posizioni 0..n-1 e timestamped è False.
+    """
+    with open(path, newline="") as f:
+        first_line = f.readline()
+        if "timestamp" not in first_line:
+            # Formato storico: una riga, nessun timestamp → posizioni 0..n-1
+            points = [(float(i), _parse_intensity(val)) for i, val in enumerate(first_line.split(","))]
+            timestamped = False
+        else:
+            f.seek(0)
+            reader = csv.DictReader(f)
+            points = [
+                (_parse_timestamp(row["timestamp"]), _parse_intensity(row["intensity"]))
+                for row in reader
+                if row["timestamp"].strip()
+            ]
+            timestamped = True
+    if not points:
+        raise ValueError(f"Nessuna previsione in {path}")
+    return timestamped, points
+
+
+class SlotIndex:
+    """
+    Finestra di previsione relativa al tick corrente con indici precalcolati.
+
+    Lo slot 0 della finestra è il tick successivo a quello corrente.
+    Tutte le interrogazioni sono O(1).
+    """
+
+    def __init__(self, intensities, start_tick=0):
+        self.intensities = list(intensities)
+        self.start_tick = start_tick
+        horizon = len(self.intensities)
+
+        # cheapest[d]: slot meno emissivo in [0, d] (il primo a parità)
+        self.cheapest = [0] * horizon
+        for t in range(1, horizon):
+            best = self.cheapest[t - 1]
+            self.cheapest[t] = t if self.intensities[t] < self.intensities[best] else best
+
+    def __len__(self):
+        return len(self.intensities)
+
+    def clamp(self, deadline):
+        """Deadline relativa riportata dentro l'orizzonte."""
+        return min(max(deadline, 0), len(self.intensities) - 1)
+
+    def cheapest_slot(self, deadline):
+        return self.cheapest[self.clamp(deadline)]
+
+    def absolute_slot(self, slot):
+        """Tick assoluto corrispondente allo slot della finestra."""
+        return self.start_tick + slot
+
+
+class CarbonForecastStore:
+    def __init__(self, paths=("co2.csv",), start=None, slot_minutes=30):
+        self.paths = list(paths)
+        # Istante (epoch, secondi) del tick 0. Se non configurato si fissa al
+        # primo timestamp del primo caricamento e non cambia più
+        self.start = start
+        self.slot_seconds = slot_minutes * 60
+        self._mtimes = {}
+        self._series = {}  # path → (timestamped, points) dell'ultimo caricamento riuscito
+        self.timestamped = False
+        self.timestamps = []   # istanti dei punti, ordinati (solo serie con timestamp)
+        self.intensities = []  # valori allineati a timestamps, o serie storica posizionale
+
+    def refresh(self):
+        """
+        Rilegge i file modificati dall'ultimo caricamento.
+
+        Un file mancante, in rotazione o illeggibile non interrompe il tick:
+        si continua con l'ultima versione caricata di quel file.
+        """
+        changed = False
+        for path in self.paths:
+            try:
+                mtime = os.path.getmtime(path)
+                if self._mtimes.get(path) == mtime:
+                    continue
+                series = load_forecast_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[FORECAST] Impossibile leggere {path}, uso l'ultima previsione caricata: {e}")
+                continue
+            self._mtimes[path] = mtime
+            # I punti del file sostituiscono quelli del caricamento precedente
+            self._series[path] = series
+            changed = True
+        if changed:
+            self._merge()
+        return changed
+
+    def _merge(self):
+        points = {}
+        legacy = []
+        for path in self.paths:
+            if path not in self._series:
+                continue
+            timestamped, series = self._series[path]
+            if timestamped:
+                # A parità di timestamp prevale il file indicato per ultimo
+                points.update(series)
+            else:
+                legacy.append(path)
+        if points:
+            if legacy:
+                print(f"[FORECAST] File senza timestamp ignorati: {', '.join(legacy)}")
+            self.timestamped = True
+            self.timestamps = sorted(points)
+            self.intensities = [points[ts] for ts in self.timestamps]
+            if self.start is None:
+                self.start = self.timestamps[0]
+                print(f"[FORECAST] forecast_start non configurato: tick 0 = "
+                      f"{datetime.fromtimestamp(self.start).isoformat()}")
+        else:
+            self.timestamped = False
+            self.timestamps = []
+            self.intensities = [value for path in legacy for _, value in self._series[path][1]]
+
+    def tick_time(self, tick):
+        """Istante (epoch, secondi) di inizio del tick."""
+        return self.start + tick * self.slot_seconds
+
+    def intensity_at(self, time):
+        """Valore in vigore all'istante `time`: l'ultimo punto con timestamp ≤ time."""
+        i = bisect.bisect_right(self.timestamps, time) - 1
+        return self.intensities[max(i, 0)]
+
+    def _covered_until(self):
+        # L'ultimo punto vale per un passo pari a quello precedente
+        step = self.timestamps[-1] - self.timestamps[-2] if len(self.timestamps) > 1 else self.slot_seconds
+        return self.timestamps[-1] + step
+
+    def window(self, current_tick, horizon):
+        """Finestra [current_tick + 1, current_tick + horizon] con i suoi indici."""
+        if not self.intensities:
+            raise RuntimeError("Nessuna previsione di intensità carbonica caricata")
+        start = current_tick + 1
+        if not self.timestamped:
+            n = len(self.intensities)
+            return SlotIndex(
+                [self.intensities[(start + i) % n] for i in range(horizon)],
+                start_tick=start,
+            )
+
+        first, last = self.tick_time(start), self.tick_time(start + horizon - 1)
+        if first < self.timestamps[0] or last >= self._covered_until():
+            print(f"[FORECAST] La previsione non copre i tick {start}..{start + horizon - 1}: "
+                  f"fuori copertura si usa il valore più vicino")
+        return SlotIndex(
+            [self.intensity_at(self.tick_time(start + i)) for i in range(horizon)],
+            start_tick=start,
+        )
+
+
+def forecast_paths(config):
+    """File di previsione configurati (separati da ';' in scheduler_config.csv)."""
+    return [p.strip() for p in str(config.get("forecast", "co2.csv")).split(";") if p.strip()]
+
+
+def forecast_start(config):
+    """Istante del tick 0 (parametro forecast_start, ISO 8601 o epoch), None se assente."""
+    value = config.get("forecast_start")
+    if value is None or str(value).strip() == "":
+        return None
+    return _parse_timestamp(str(value))
+
+
+def forecast_slot_minutes(config):
+    return config.get("slot_minutes", 30)
+
+
+def forecast_horizon(config):
+    return config.get("horizon", 5)
+
+
+def slot_ring_size(horizon):
+    """
+    Numero di code di slot condivise da scheduler e service.
+
+    Al tick t lo scheduler assegna i tick t+1..t+horizon mentre il service
+    svuota la coda del tick t: con horizon + 1 code questi horizon + 1 tick
+    cadono tutti in code diverse, quindi nessuna richiesta viene eseguita
+    in anticipo da un drain concorrente.
+    """
+    return horizon + 1
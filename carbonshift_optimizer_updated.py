@@ -7,12 +7,14 @@ from collections import defaultdict
 import random
 
 # only for benchmark
-def assign_requests_fixed(requests, strategy_mode, delta, strategies, carbon_intensities, current_tick):
+def assign_requests_fixed(requests, strategy_mode, delta, strategies, carbon_intensities, current_tick, slot_index=None):
     """
     Assegna tutte le richieste con una strategia fissa (o casuale se 'naive') e salva l'output su CSV.
 
     strategy_mode: "low", "medium", "high", o "naive"
     current_tick: slot attuale del clock, si usa (current_tick + 1) % delta
+    slot_index: finestra di previsione (carbon_forecast.SlotIndex). Se presente,
+                slot e deadline sono relativi al tick corrente (slot 0 = tick successivo)
     """
     import os
     assignment = {}
@@ -32,13 +34,16 @@ def assign_requests_fixed(requests, strategy_mode, delta, strategies, carbon_int
             writer.writerow(["request_id", "strategy", "time_slot", "emission", "error"])
 
         rows = []
-        next_slot = (current_tick + 1) % delta
+        next_slot = 0 if slot_index is not None else (current_tick + 1) % delta
 
         for req in requests:
             req_id = req["id"]
             deadline = req["deadline"]
 
-            if strategy_mode == "naive":
+            if strategy_mode == "naive" and slot_index is not None:
+                strategy = random.choice(list(strategies_map.keys()))
+                slot = random.randint(0, slot_index.clamp(deadline))
+            elif strategy_mode == "naive":
                 strategy = random.choice(list(strategies_map.keys()))
 
                 slot_upper_bound = min(deadline, delta - 1)
@@ -81,7 +86,23 @@ def assign_requests_fixed(requests, strategy_mode, delta, strategies, carbon_int
     return assignment
 
 
-def assign_requests_carbonshift(requests, strategies, carbon_intensities, delta, epsilon, beta=None):
+def split_into_blocks(requests, beta=None):
+    '''
+    Divide le richieste nei blocchi usati da assign_requests_carbonshift.
+    Tutte le richieste di un blocco ricevono lo stesso slot e la stessa strategia.
+    '''
+    if beta is None:
+        beta = 1000
+    if beta >= len(requests): # if beta is None or beta >= len(requests):
+        # Versione base → ogni richiesta è un blocco separato
+        return [[req] for req in requests]
+    # Versione scalabile → ordinamento per deadline e suddivisione in β gruppi
+    sorted_requests = sorted(requests, key=lambda r: r["deadline"])
+    group_size = math.ceil(len(requests) / beta)
+    return [sorted_requests[i:i + group_size] for i in range(0, len(sorted_requests), group_size)]
+
+
+def assign_requests_carbonshift(requests, strategies, carbon_intensities, delta, epsilon, beta=None, slot_index=None):
     '''
     Funzione che implementa lo scheduling Carbonshift con supporto a blocchi configurabili (β).
 
@@ -92,23 +113,16 @@ def assign_requests_carbonshift(requests, strategies, carbon_intensities, delta,
     - delta: numero totale di slot temporali futuri (es. 48 per 24 ore a slot da 30 minuti)
     - epsilon: soglia massima per l’errore medio accettabile
     - beta: numero di blocchi. Se None o ≥ len(requests), ogni richiesta è trattata singolarmente
+    - slot_index: indici precalcolati della finestra (carbon_forecast.SlotIndex). Se presente,
+      per ogni blocco si crea solo lo slot meno emissivo entro la deadline: l'errore non dipende
+      dallo slot, quindi l'ottimo non cambia e le variabili passano da β·S·T a β·S
 
     Ritorna:
     - assignment: dizionario {request_id: (slot, strategy_name)}
     '''
 
     # BLOCCO 1 - Divisione delle richieste in blocchi (β)
-    if beta is None:
-        beta = 1000
-    if beta >= len(requests): # if beta is None or beta >= len(requests):
-        # Versione base → ogni richiesta è un blocco separato
-        blocks = [[req] for req in requests]
-        group_size = 1 
-    else:
-        # Versione scalabile → ordinamento per deadline e suddivisione in β gruppi
-        sorted_requests = sorted(requests, key=lambda r: r["deadline"])
-        group_size = math.ceil(len(requests) / beta)
-        blocks = [sorted_requests[i:i + group_size] for i in range(0, len(sorted_requests), group_size)]
+    blocks = split_into_blocks(requests, beta)
 
     # Debug info  
     # print(f"[DEBUG] Numero richieste: {len(requests)} — β: {beta} → blocchi generati: {len(blocks)}")   
@@ -130,37 +144,40 @@ def assign_requests_carbonshift(requests, strategies, carbon_intensities, delta,
     block_deadlines = [min(req["deadline"] for req in group) for group in blocks]
 
     # Variabili decisionali binarie: x[b,s,t] = 1 se blocco b è assegnato alla strategia s nello slot t
+    # Vincolo: slot t deve rispettare la deadline del blocco
+    if slot_index is not None:
+        block_slots = [[slot_index.cheapest_slot(d)] for d in block_deadlines]
+    else:
+        block_slots = [[t for t in T if t <= d] for d in block_deadlines]
+
     x = {}
     for b in B:
         for s in S:
-            for t in T:
-                # Vincolo: slot t deve rispettare la deadline del blocco
-                if t <= block_deadlines[b]:
-                    x[(b, s, t)] = model.NewBoolVar(f"x_{b}_{s}_{t}")
+            for t in block_slots[b]:
+                x[(b, s, t)] = model.NewBoolVar(f"x_{b}_{s}_{t}")
 
     # Vincolo 1: ogni blocco deve essere assegnato ad una sola combinazione (slot, strategia)
     for b in B:
-        model.AddExactlyOne(x[(b, s, t)] for s in S for t in T if (b, s, t) in x)
+        model.AddExactlyOne(x[(b, s, t)] for s in S for t in block_slots[b])
 
     # Vincolo 2: errore medio totale ≤ epsilon * numero_blocchi
     # Regola: somma degli errori pesati per le strategie usate deve essere entro soglia
     total_error_expr = []
     for b in B:
         for s in S:
-            for t in T:
-                if (b, s, t) in x:
-                    total_error_expr.append(x[(b, s, t)] * strategies[s]["error"])
-    model.Add(sum(total_error_expr) <= epsilon * len(blocks))
+            for t in block_slots[b]:
+                total_error_expr.append(x[(b, s, t)] * strategies[s]["error"])
+    # epsilon può essere non intero se concesso dal coordinatore degli shard
+    model.Add(sum(total_error_expr) <= math.floor(epsilon * len(blocks)))
 
     # Obiettivo: minimizzare somma(CO₂[t] * durata strategia s) su tutti i blocchi assegnati
     objective_terms = []
     for b in B:
         for s in S:
-            for t in T:
-                if (b, s, t) in x:
-                    objective_terms.append(
-                        x[(b, s, t)] * carbon_intensities[t] * strategies[s]["duration"]
-                    )
+            for t in block_slots[b]:
+                objective_terms.append(
+                    x[(b, s, t)] * carbon_intensities[t] * strategies[s]["duration"]
+                )
     model.Minimize(sum(objective_terms))
 
     # Risoluzione
@@ -197,8 +214,8 @@ def assign_requests_carbonshift(requests, strategies, carbon_intensities, delta,
         rows = []
         for b in B:
             for s in S:
-                for t in T:
-                    if (b, s, t) in x and solver.BooleanValue(x[(b, s, t)]):
+                for t in block_slots[b]:
+                    if solver.BooleanValue(x[(b, s, t)]):
                         for req in blocks[b]:
                             req_id = req["id"]
                             strat_name = strategies[s]["name"]
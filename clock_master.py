@@ -1,19 +1,14 @@
-import pika
 import time
-import json
+from config_loader import load_scheduler_config_csv
+from transport import get_transport
 
 def clock_master(tick_interval=30):
-    connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-    channel = connection.channel()
-
-    # Dichiarazione exchange fanout
-    channel.exchange_declare(exchange="tick_exchange", exchange_type="fanout")
+    transport = get_transport(load_scheduler_config_csv("scheduler_config.csv"))
 
     tick_count = 0
     while True:
-        message = {"tick": tick_count}
-        # Pubblica sul fanout exchange (routing_key vuota)
-        channel.basic_publish(exchange="tick_exchange", routing_key="", body=json.dumps(message))
+        # Fanout a tutti i componenti in ascolto
+        transport.publish_tick(tick_count)
         print(f"[CLOCK] Tick {tick_count} inviato")
         tick_count += 1
         time.sleep(tick_interval)
@@ -0,0 +1,13 @@
+import csv
+
+def load_scheduler_config_csv(path="scheduler_config.csv"):
+    config = {}
+    with open(path, newline="") as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            value = row["value"]
+            try:
+                config[row["parameter"]] = int(float(value))
+            except ValueError:
+                config[row["parameter"]] = value  # lascia come stringa se non convertibile
+    return config
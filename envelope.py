@@ -0,0 +1,126 @@
+import json
+
+try:
+    import msgpack
+except ImportError:  # msgpack opzionale: senza, si usa solo JSON
+    msgpack = None
+
+# Envelope binario compatto usato su ogni hop
+# (frontend → ingress_queue → scheduler → slot_exchange → service).
+# Il formato in uscita è scelto esplicitamente con il parametro `wire_format`
+# di scheduler_config.csv ("json" di default, oppure "msgpack"); in ingresso
+# il decoder è scelto dal content-type del messaggio: un messaggio senza
+# content-type (o con application/json) viene sempre letto come JSON.
+ENVELOPE_VERSION = 1
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/vnd.carbonshift.v1+msgpack"
+
+# Codici interni per task e strategie: evitano di ripetere le stringhe complete
+# in ogni messaggio. Aggiungere nuovi codici solo in coda (compatibilità).
+TASK_CODES = {
+    "Text Generation": 0,
+    "Named Entity Recognition": 1,
+    "Question Answering": 2,
+}
+STRATEGY_CODES = {
+    "low": 0,
+    "medium": 1,
+    "high": 2,
+}
+TASK_NAMES = {code: name for name, code in TASK_CODES.items()}
+STRATEGY_NAMES = {code: name for name, code in STRATEGY_CODES.items()}
+
+# Posizioni dei campi nell'envelope msgpack. Un campo posizionale a None
+# significa "assente"; tutto il resto (chiavi non previste, valori None o
+# non codificabili) viaggia nel dizionario finale _EXTRAS.
+_VERSION, _TASK, _PAYLOAD, _DEADLINE, _CALLBACK, _SLOT, _STRATEGY, _EXTRAS = range(8)
+_POSITIONAL_KEYS = ("M", "D", "C", "slot", "strategy")
+
+
+def wire_content_type(config):
+    """Content-type configurato per i messaggi in uscita (parametro wire_format)."""
+    wire_format = config.get("wire_format", "json")
+    if wire_format == "json":
+        return CONTENT_TYPE_JSON
+    if wire_format == "msgpack":
+        if msgpack is None:
+            raise RuntimeError("wire_format=msgpack ma il modulo msgpack non è installato")
+        return CONTENT_TYPE_MSGPACK
+    raise ValueError(f"wire_format non supportato: {wire_format}")
+
+
+def _pack(data):
+    extras = {key: value for key, value in data.items() if key not in _POSITIONAL_KEYS}
+    for key in _POSITIONAL_KEYS:
+        if key in data and data[key] is None:
+            extras[key] = None
+
+    payload = data.get("M")
+    task_code = None
+    if isinstance(payload, dict) and payload.get("task") in TASK_CODES:
+        payload = dict(payload)
+        task_code = TASK_CODES[payload.pop("task")]  # il nome del task viaggia come codice
+
+    strategy = data.get("strategy")
+    strategy_code = None
+    if isinstance(strategy, str) and strategy in STRATEGY_CODES:
+        strategy_code = STRATEGY_CODES[strategy]
+    elif strategy is not None:
+        extras["strategy"] = strategy
+
+    envelope = [
+        ENVELOPE_VERSION,
+        task_code,
+        payload,
+        data.get("D"),
+        data.get("C"),
+        data.get("slot"),
+        strategy_code,
+        extras,
+    ]
+    return msgpack.packb(envelope, use_bin_type=True)
+
+
+def _unpack(body):
+    envelope = msgpack.unpackb(body, raw=False)
+    if envelope[_VERSION] != ENVELOPE_VERSION:
+        raise ValueError(f"Versione envelope non supportata: {envelope[_VERSION]}")
+
+    payload = envelope[_PAYLOAD]
+    if envelope[_TASK] is not None:
+        payload = {"task": TASK_NAMES[envelope[_TASK]], **payload}
+
+    data = {}
+    if payload is not None:
+        data["M"] = payload
+    if envelope[_DEADLINE] is not None:
+        data["D"] = envelope[_DEADLINE]
+    if envelope[_CALLBACK] is not None:
+        data["C"] = envelope[_CALLBACK]
+    if envelope[_SLOT] is not None:
+        data["slot"] = envelope[_SLOT]
+    if envelope[_STRATEGY] is not None:
+        data["strategy"] = STRATEGY_NAMES[envelope[_STRATEGY]]
+    if len(envelope) > _EXTRAS:
+        data.update(envelope[_EXTRAS])
+    return data
+
+
+def encode_message(data, content_type=CONTENT_TYPE_JSON):
+    """
+    Serializza un messaggio di richiesta.
+
+    Ritorna la coppia (body, content_type) da pubblicare sul broker.
+    """
+    if content_type == CONTENT_TYPE_MSGPACK:
+        return _pack(data), CONTENT_TYPE_MSGPACK
+    return json.dumps(data), CONTENT_TYPE_JSON
+
+
+def decode_message(body, content_type=None):
+    """Deserializza un messaggio in base al content-type con cui è stato pubblicato."""
+    if content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise RuntimeError("Ricevuto messaggio msgpack ma il modulo msgpack non è installato")
+        return _unpack(body)
+    return json.loads(body)
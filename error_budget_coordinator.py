@@ -0,0 +1,59 @@
+from flask import Flask, request, jsonify
+import threading
+from config_loader import load_scheduler_config_csv
+
+# Coordinatore leggero del budget di errore (epsilon) tra scheduler shardati.
+#
+# Il budget è espresso per blocco, la stessa unità del vincolo
+# dell'ottimizzatore (somma errori dei blocchi ≤ epsilon * blocchi).
+# Il budget non usato (slack = epsilon * blocchi - errore effettivo) viene
+# accumulato qui e ridistribuito agli shard nei tick successivi; uno
+# sforamento (slack negativo, es. nei modi fissi) resta come debito e riduce
+# l'epsilon concesso finché non è recuperato. Se il coordinatore non è
+# raggiungibile gli shard usano semplicemente epsilon.
+
+app = Flask(__name__)
+
+config = load_scheduler_config_csv("scheduler_config.csv")
+EPSILON = config.get("epsilon", 3)
+NUM_SHARDS = config.get("shards", 1)
+
+ledger_lock = threading.Lock()
+ledger = {
+    "slack": 0.0,     # budget di errore non ancora concesso (negativo = debito)
+    "blocks": 0,      # blocchi schedulati in totale
+    "error_used": 0,  # errore totale effettivo
+}
+
+@app.route("/budget", methods=["POST"])
+def budget():
+    data = request.json
+    n_blocks = data.get("blocks", 0)
+    with ledger_lock:
+        # Ogni shard prende (o ripaga, se c'è debito) la sua quota dello slack
+        grant = ledger["slack"] / max(NUM_SHARDS, 1) if n_blocks > 0 else 0.0
+        ledger["slack"] -= grant
+    epsilon = EPSILON + (grant / n_blocks if n_blocks > 0 else 0.0)
+    print(f"[COORDINATOR] Shard {data.get('shard')} tick {data.get('tick')}: "
+          f"{n_blocks} blocchi → epsilon {epsilon:.3f}")
+    return jsonify({"epsilon": epsilon, "grant": grant})
+
+@app.route("/report", methods=["POST"])
+def report():
+    data = request.json
+    n_blocks = data.get("blocks", 0)
+    error_used = data.get("error_used", 0)
+    grant = data.get("grant", 0.0)
+    with ledger_lock:
+        ledger["blocks"] += n_blocks
+        ledger["error_used"] += error_used
+        # Nessun clamp: uno sforamento resta come debito per i tick successivi
+        ledger["slack"] += EPSILON * n_blocks + grant - error_used
+        slack = ledger["slack"]
+        avg_error = ledger["error_used"] / ledger["blocks"] if ledger["blocks"] else 0.0
+    print(f"[COORDINATOR] Shard {data.get('shard')}: errore {error_used} su {n_blocks} blocchi "
+          f"(media globale {avg_error:.3f}, slack {slack:.1f})")
+    return jsonify({"slack": slack})
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5002, threaded=True)
@@ -1,22 +1,56 @@
+from queue import Queue, Empty
 from flask import Flask, request
-import pika
-import json
+from envelope import encode_message, wire_content_type
+from config_loader import load_scheduler_config_csv
+from sharding import shard_for_message, ingress_queue_name
+from transport import get_transport
 
 app = Flask(__name__)
 
+config = load_scheduler_config_csv("scheduler_config.csv")
+NUM_SHARDS = config.get("shards", 1)
+PARTITION = config.get("partition", "hash")  # "task" oppure "hash"
+CONTENT_TYPE = wire_content_type(config)
+
+# Transport inattivi riusati tra le richieste. Il server Flask crea un thread
+# per richiesta e una connessione pika non è thread-safe: ogni richiesta
+# prende un transport in uso esclusivo e lo rimette nel pool alla fine, così
+# le connessioni aperte non superano le richieste concorrenti.
+transport_pool = Queue()
+
+def publish_request(queue_name, body, content_type):
+    # Un transport del pool può avere una connessione scaduta: viene
+    # scartato e si riprova una volta con un transport nuovo
+    for attempt in range(2):
+        try:
+            transport, pooled = transport_pool.get_nowait(), True
+        except Empty:
+            transport, pooled = get_transport(config), False
+        try:
+            transport.publish_request(queue_name, body, content_type)
+        except Exception:
+            try:
+                transport.close()
+            except Exception:
+                pass
+            if attempt or not pooled:
+                raise
+            continue
+        transport_pool.put(transport)
+        return
+
 @app.route("/request", methods=["POST"])
 def handle_request():
     data = request.json
     print(f"[FRONTEND] Richiesta ricevuta: {data}")
     try:
-        connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-        channel = connection.channel()
-        channel.queue_declare(queue="ingress_queue")
-        channel.basic_publish(exchange="", routing_key="ingress_queue", body=json.dumps(data))
-        connection.close()
+        # Instrada la richiesta verso la partizione dello scheduler responsabile
+        queue_name = ingress_queue_name(shard_for_message(data, NUM_SHARDS, PARTITION), NUM_SHARDS)
+        body, content_type = encode_message(data, CONTENT_TYPE)
+        publish_request(queue_name, body, content_type)
         return "Richiesta ricevuta!", 200
     except Exception as e:
-        print(f"Errore nel publish RabbitMQ: {e}")
+        print(f"Errore nel publish: {e}")
         return "Errore nel publish", 500
 
 if __name__ == "__main__":
@@ -1,16 +1,40 @@
-import pika
-import json
 import random
 import csv
 from carbonshift_optimizer_updated import (
     assign_requests_carbonshift,
     assign_requests_fixed,
+    split_into_blocks,
 )
 import os
+import argparse
+import requests as http
+from envelope import encode_message, decode_message, wire_content_type
+from config_loader import load_scheduler_config_csv
+from sharding import ingress_queue_name, make_request_id
+from carbon_forecast import (
+    CarbonForecastStore,
+    forecast_paths,
+    forecast_start,
+    forecast_slot_minutes,
+    forecast_horizon,
+    slot_ring_size,
+)
+from transport import get_transport
 
 current_tick_global = 0
 
-global_request_counter = 0  # Conta le richieste globalmente (NON si azzera mai)
+global_request_counter = 0  # Conta le richieste di questo shard (NON si azzera mai)
+
+# Modalità shardata: ogni istanza consuma una partizione del traffico di ingresso
+SHARD_ID = 0
+NUM_SHARDS = 1
+# Letto una sola volta all'avvio: il service dimensiona l'anello di code di
+# slot con lo stesso valore e non lo rilegge a caldo
+HORIZON = 5
+COORDINATOR_TIMEOUT = 0.5  # secondi
+
+forecast_store = None  # previsioni di intensità carbonica, ricaricate se i file cambiano
+forecast_settings = None  # (file, forecast_start, slot_minutes) con cui è stato creato lo store
 
 def load_strategies_csv(path="strategies.csv"):
     strategies = []
@@ -24,54 +48,80 @@ def load_strategies_csv(path="strategies.csv"):
             })
     return strategies
 
-def load_carbon_intensities_csv(path="co2.csv"):
-    with open(path, "r") as f:
-        return [int(val.strip()) for val in f.readline().split(",")]
+def request_error_budget(config, n_blocks):
+    """
+    Chiede al coordinatore la quota di epsilon per questo tick.
+    Il budget è espresso per blocco, come il vincolo dell'ottimizzatore.
+    Ritorna (epsilon, grant); senza coordinatore si usa l'epsilon locale.
+    """
+    epsilon = config.get("epsilon", 3)
+    coordinator_url = config.get("coordinator_url")
+    if not coordinator_url or NUM_SHARDS <= 1:
+        return epsilon, 0.0
+    try:
+        response = http.post(f"{coordinator_url}/budget", json={
+            "shard": SHARD_ID,
+            "tick": current_tick_global,
+            "blocks": n_blocks
+        }, timeout=COORDINATOR_TIMEOUT)
+        response.raise_for_status()
+        budget = response.json()
+        return budget["epsilon"], budget["grant"]
+    except Exception as e:
+        print(f"[SCHEDULER] Coordinatore non raggiungibile, uso epsilon locale: {e}")
+        return epsilon, 0.0
+
+def report_error_budget(config, n_blocks, error_used, grant):
+    coordinator_url = config.get("coordinator_url")
+    if not coordinator_url or NUM_SHARDS <= 1:
+        return
+    try:
+        http.post(f"{coordinator_url}/report", json={
+            "shard": SHARD_ID,
+            "blocks": n_blocks,
+            "error_used": error_used,
+            "grant": grant
+        }, timeout=COORDINATOR_TIMEOUT)
+    except Exception as e:
+        print(f"[SCHEDULER] Report al coordinatore fallito: {e}")
 
-def load_scheduler_config_csv(path="scheduler_config.csv"):
-    config = {}
-    with open(path, newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            value = row["value"]
-            try:
-                config[row["parameter"]] = int(float(value))
-            except ValueError:
-                config[row["parameter"]] = value  # lascia come stringa se non convertibile
-    return config
-    
 def carbon_shift_strategy():
     return random.choice(["low", "medium", "high"])
 
-def consume_ingress_queue(channel):
+def consume_ingress_queue(transport):
     messages = []
-    while True:
-        method, properties, body = channel.basic_get(queue="ingress_queue", auto_ack=True)
-        if body:
-            data = json.loads(body)
-            messages.append(data)
-        else:
-            break
+    for body, content_type in transport.drain_ingress(ingress_queue_name(SHARD_ID, NUM_SHARDS)):
+        try:
+            messages.append(decode_message(body, content_type))
+        except Exception as e:
+            # Un messaggio illeggibile non deve far perdere il resto del batch
+            print(f"[SCHEDULER] Messaggio scartato ({content_type}): {e}")
     return messages
 
-def flush_to_slot_queues(channel, messages):
-    # Exchange per slot topic
-    channel.exchange_declare(exchange="slot_exchange", exchange_type="topic")
-
+def flush_to_slot_queues(transport, messages):
     # Carica parametri da CSV
     strategies = load_strategies_csv("strategies.csv")
-    carbon_intensities = load_carbon_intensities_csv("co2.csv")
     config = load_scheduler_config_csv("scheduler_config.csv")
 
-    delta = len(carbon_intensities)
-    epsilon = config.get("epsilon", 3)
+    global forecast_store, forecast_settings
+    settings = (forecast_paths(config), forecast_start(config), forecast_slot_minutes(config))
+    if forecast_store is None or forecast_settings != settings:
+        forecast_store = CarbonForecastStore(*settings)
+        forecast_settings = settings
+    forecast_store.refresh()
+
+    # Finestra relativa al tick corrente: slot 0 = tick successivo, deadline relative
+    horizon = HORIZON
+    slot_index = forecast_store.window(current_tick_global, horizon)
+    carbon_intensities = slot_index.intensities
+    delta = horizon
     beta = config.get("beta", len(messages))
 
     global global_request_counter
     requests = []
     for msg in messages:
         requests.append({
-            'id': global_request_counter,
+            'id': make_request_id(global_request_counter, SHARD_ID, NUM_SHARDS),
             'deadline': msg.get('D', 4)
         })
         global_request_counter += 1
@@ -83,10 +133,24 @@ def flush_to_slot_queues(channel, messages):
     #)
 
     mode = config.get("mode", "carbonshift")
+    # Unità del budget di errore: i blocchi dell'ottimizzatore (nei modi fissi
+    # ogni richiesta è un blocco a sé)
+    if mode in ["always_low", "always_medium", "always_high", "naive"]:
+        blocks = [[req] for req in requests]
+    else:
+        blocks = split_into_blocks(requests, beta)
+    epsilon, grant = request_error_budget(config, len(blocks))
+    # Con un debito da recuperare il coordinatore può abbassare epsilon, ma
+    # non sotto la strategia meno imprecisa (il modello resterebbe senza
+    # soluzione). L'epsilon configurato resta invariato anche se più basso.
+    config_epsilon = config.get("epsilon", 3)
+    epsilon = max(epsilon, min(config_epsilon, min(s["error"] for s in strategies)))
 
     if mode in ["always_low", "always_medium", "always_high", "naive"]:
         fixed_mode = mode.replace("always_", "") if mode.startswith("always_") else mode
-        assignment = assign_requests_fixed(requests, fixed_mode, delta, strategies, carbon_intensities, current_tick_global)
+        assignment = assign_requests_fixed(
+            requests, fixed_mode, delta, strategies, carbon_intensities, current_tick_global, slot_index=slot_index
+        )
     else:
         assignment = assign_requests_carbonshift(
             requests,
@@ -94,23 +158,25 @@ def flush_to_slot_queues(channel, messages):
             carbon_intensities,
             delta,
             epsilon,
-            beta
+            beta,
+            slot_index=slot_index
         )
 
+    errors = {s["name"]: s["error"] for s in strategies}
+    error_used = sum(errors[assignment[block[0]["id"]][1]] for block in blocks)
+    report_error_budget(config, len(blocks), error_used, grant)
+
     for i, data in enumerate(messages):
         deadline = data.get("D", 4)  # prendi deadline, default 4 se mancante
-        slot, strategy = assignment[i]
+        slot, strategy = assignment[requests[i]["id"]]
+        slot = slot_index.absolute_slot(slot)  # tick in cui verrà eseguita
         data["slot"] = slot
         data["strategy"] = strategy
 
-        routing_key = f"slot.{slot}"
-
-        # Pubblica sul topic exchange
-        channel.basic_publish(
-            exchange="slot_exchange",
-            routing_key=routing_key,
-            body=json.dumps(data)
-        )
+        # Le code di slot sono un anello di horizon + 1 code: gli slot assegnati
+        # (tick t+1..t+horizon) non cadono mai nella coda del tick corrente
+        body, content_type = encode_message(data, wire_content_type(config))
+        transport.publish_slot(slot % slot_ring_size(horizon), body, content_type)
 
         print(f"""[SCHEDULER] Richiesta smistata:
     • Messaggio: {data["M"]}
@@ -119,34 +185,39 @@ def flush_to_slot_queues(channel, messages):
 """)
 
 def listen_for_ticks():
-    connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-    channel = connection.channel()
-
-    channel.queue_declare(queue="ingress_queue")  # Assicura che esista
+    config = load_scheduler_config_csv("scheduler_config.csv")
+    wire_content_type(config)  # fallisce subito se wire_format non è utilizzabile
+    transport = get_transport(config)
 
-    # Dichiara exchange fanout tick_exchange
-    channel.exchange_declare(exchange="tick_exchange", exchange_type="fanout")
-    # Crea coda temporanea esclusiva per questo consumer
-    result = channel.queue_declare(queue="", exclusive=True)
-    queue_name = result.method.queue
-    # Bind coda temporanea all'exchange fanout
-    channel.queue_bind(exchange="tick_exchange", queue=queue_name)
+    ingress_queue = ingress_queue_name(SHARD_ID, NUM_SHARDS)
+    transport.bind_ingress(ingress_queue)
 
-    def on_tick(ch, method, properties, body):
+    def on_tick(tick):
         global current_tick_global
-        tick = json.loads(body)["tick"]
         current_tick_global = tick  # salva il tick globalmente
         print(f"[SCHEDULER] Tick ricevuto: {tick}")
-        requests = consume_ingress_queue(channel)
+        requests = consume_ingress_queue(transport)
         if requests:
-            print(f"[SCHEDULER] Prelevo {len(requests)} richieste da 'ingress_queue'")
-            flush_to_slot_queues(channel, requests)
+            print(f"[SCHEDULER] Prelevo {len(requests)} richieste da '{ingress_queue}'")
+            flush_to_slot_queues(transport, requests)
         else:
             print("[SCHEDULER] Nessuna richiesta da elaborare.")
 
     print("[SCHEDULER] In ascolto dei tick...")
-    channel.basic_consume(queue=queue_name, on_message_callback=on_tick, auto_ack=True)
-    channel.start_consuming()
+    transport.consume_ticks(on_tick)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scheduler Carbonshift (eventualmente shardato).")
+    parser.add_argument("--shard", type=int, default=0, help="Indice di questo shard (0..shards-1)")
+    args = parser.parse_args()
+
+    # Il numero di shard viene solo da scheduler_config.csv: frontend e
+    # coordinatore devono usare lo stesso valore per instradare le richieste
+    config = load_scheduler_config_csv("scheduler_config.csv")
+    SHARD_ID = args.shard
+    NUM_SHARDS = config.get("shards", 1)
+    HORIZON = forecast_horizon(config)
+    if not 0 <= SHARD_ID < NUM_SHARDS:
+        parser.error(f"--shard deve essere compreso tra 0 e {NUM_SHARDS - 1}")
+    print(f"[SCHEDULER] Shard {SHARD_ID}/{NUM_SHARDS}, orizzonte {HORIZON} slot")
     listen_for_ticks()
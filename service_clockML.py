@@ -1,11 +1,13 @@
-import pika
-import json
 import requests
 from transformers import pipeline
 import logging
 from transformers.utils import logging as hf_logging
 import csv
 from collections import defaultdict
+from envelope import decode_message
+from config_loader import load_scheduler_config_csv
+from carbon_forecast import forecast_horizon, slot_ring_size
+from transport import get_transport
 
 hf_logging.set_verbosity_error()
 logging.getLogger("transformers").setLevel(logging.ERROR)
@@ -29,7 +31,9 @@ MODEL_REGISTRY = {
 }
 
 current_slot = 0
-TOTAL_SLOTS = 5
+config = load_scheduler_config_csv("scheduler_config.csv")
+# Numero di code di slot: deve coincidere con l'anello usato dallo scheduler
+TOTAL_SLOTS = slot_ring_size(forecast_horizon(config))
 ALL_EXECUTED_STRATEGIES = []
 
 def load_strategy_costs(path="strategies.csv"):
@@ -101,43 +105,31 @@ def service_s_execute(slot, request_data):
     print(f"[SERVICE] Esecuzione slot {slot}: {response}")
     requests.post(request_data["C"], json=response)
 
-def consume_slot_queue(channel, queue_name, slot):
-    while True:
-        method, properties, body = channel.basic_get(queue=queue_name, auto_ack=True)
-        if body:
-            request_data = json.loads(body)
-            service_s_execute(slot, request_data)
-        else:
-            break
+def consume_slot_queue(transport, queue_index, slot):
+    for body, content_type in transport.drain_slot(queue_index):
+        try:
+            request_data = decode_message(body, content_type)
+        except Exception as e:
+            print(f"[SERVICE] Messaggio scartato ({content_type}): {e}")
+            continue
+        service_s_execute(slot, request_data)
 
 
 def listen_to_ticks():
     global current_slot
-    connection = pika.BlockingConnection(pika.ConnectionParameters("localhost"))
-    channel = connection.channel()
-
-    channel.exchange_declare(exchange="tick_exchange", exchange_type="fanout")
-    channel.exchange_declare(exchange="slot_exchange", exchange_type="topic")
-
-    for i in range(TOTAL_SLOTS):
-        queue_name = f"slot_queue_{i}"
-        channel.queue_declare(queue=queue_name)
-        channel.queue_bind(exchange="slot_exchange", queue=queue_name, routing_key=f"slot.{i}")
-
-    tick_queue = channel.queue_declare(queue="", exclusive=True).method.queue
-    channel.queue_bind(exchange="tick_exchange", queue=tick_queue)
+    transport = get_transport(config)
+    transport.bind_slots(TOTAL_SLOTS)
 
-    def on_tick(ch, method, properties, body):
+    def on_tick(tick):
         global current_slot
-        tick_data = json.loads(body)
-        print(f"[SERVICE] Ricevuto tick {tick_data['tick']} → Slot {current_slot}")
-        consume_slot_queue(channel, f"slot_queue_{current_slot}", current_slot)
-        current_slot = (current_slot + 1) % TOTAL_SLOTS
-        
+        # Lo scheduler assegna slot assoluti (tick): la coda è tick % TOTAL_SLOTS
+        current_slot = tick
+        queue_index = current_slot % TOTAL_SLOTS
+        print(f"[SERVICE] Ricevuto tick {current_slot} → Coda slot {queue_index}")
+        consume_slot_queue(transport, queue_index, current_slot)
 
-    channel.basic_consume(queue=tick_queue, on_message_callback=on_tick, auto_ack=True)
     print("[SERVICE] In ascolto dei tick...")
-    channel.start_consuming()
+    transport.consume_ticks(on_tick)
 
 if __name__ == "__main__":
     listen_to_ticks()
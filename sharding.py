@@ -0,0 +1,71 @@
+import bisect
+import hashlib
+import json
+from functools import lru_cache
+from envelope import TASK_CODES
+
+# Partizionamento del traffico di ingresso tra più scheduler (shard).
+# Con un solo shard si usa la coda storica "ingress_queue", quindi il
+# comportamento single-node resta invariato.
+INGRESS_QUEUE = "ingress_queue"
+VIRTUAL_NODES = 64  # nodi virtuali per shard sull'anello di hashing
+
+
+def _hash(key):
+    # md5 e non hash(): deve dare lo stesso valore in processi diversi
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+@lru_cache(maxsize=None)
+def _ring(num_shards):
+    points = sorted(
+        (_hash(f"shard-{shard}-{v}"), shard)
+        for shard in range(num_shards)
+        for v in range(VIRTUAL_NODES)
+    )
+    return [p[0] for p in points], [p[1] for p in points]
+
+
+def consistent_hash(key, num_shards):
+    """Shard responsabile della chiave sull'anello di consistent hashing."""
+    if num_shards <= 1:
+        return 0
+    hashes, shards = _ring(num_shards)
+    i = bisect.bisect(hashes, _hash(key)) % len(hashes)
+    return shards[i]
+
+
+def partition_key(data, partition="hash"):
+    """
+    Chiave di partizionamento di una richiesta.
+
+    partition: "task" → tutte le richieste dello stesso task sullo stesso shard
+               "hash" → distribuzione uniforme sull'intero contenuto del messaggio
+    """
+    if partition == "task":
+        payload = data.get("M", {})
+        return payload.get("task", "Echo") if isinstance(payload, dict) else "Echo"
+    return json.dumps(data, sort_keys=True)
+
+
+def shard_for_message(data, num_shards, partition="hash"):
+    key = partition_key(data, partition)
+    if partition == "task" and key in TASK_CODES:
+        # Con pochi task l'anello li concentrerebbe su pochi shard:
+        # i task noti sono distribuiti in modo deterministico per codice
+        return TASK_CODES[key] % max(num_shards, 1)
+    return consistent_hash(key, num_shards)
+
+
+def ingress_queue_name(shard, num_shards):
+    if num_shards <= 1:
+        return INGRESS_QUEUE
+    return f"{INGRESS_QUEUE}.{shard}"
+
+
+def make_request_id(local_counter, shard, num_shards):
+    """
+    ID globale senza stato condiviso: gli ID dello shard k sono
+    k, k + N, k + 2N, ... con N = numero di shard.
+    """
+    return local_counter * num_shards + shard
@@ -0,0 +1,75 @@
+import os
+
+from carbon_forecast import CarbonForecastStore, SlotIndex, _parse_timestamp
+
+
+def write(path, text, mtime=None):
+    path.write_text(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))  # mtime diverso anche se riscritto nello stesso istante
+    return str(path)
+
+
+def test_cheapest_slot_picks_first_on_ties():
+    index = SlotIndex([50, 30, 30, 40, 30])
+    assert [index.cheapest_slot(d) for d in range(5)] == [0, 1, 1, 1, 1]
+
+
+def test_cheapest_slot_clamps_deadline():
+    index = SlotIndex([50, 30, 10])
+    assert index.cheapest_slot(-3) == 0
+    assert index.cheapest_slot(99) == 2
+
+
+def test_legacy_window_wraps_and_keeps_start_tick(tmp_path):
+    store = CarbonForecastStore([write(tmp_path / "co2.csv", "10,20,30,40")])
+    store.refresh()
+    index = store.window(current_tick=2, horizon=5)
+    assert index.intensities == [40, 10, 20, 30, 40]
+    assert index.absolute_slot(0) == 3
+    assert index.absolute_slot(index.cheapest_slot(4)) == 4
+
+
+def test_timestamped_window_is_anchored_to_start(tmp_path):
+    path = write(tmp_path / "f.csv", "timestamp,intensity\n"
+                 "2026-01-01T00:00,10\n2026-01-01T00:30,20\n2026-01-01T01:00,30\n")
+    store = CarbonForecastStore([path], start=_parse_timestamp("2026-01-01T00:00"), slot_minutes=30)
+    store.refresh()
+    assert store.window(current_tick=0, horizon=2).intensities == [20, 30]
+    assert store.window(current_tick=-1, horizon=3).intensities == [10, 20, 30]
+
+
+def test_mixed_resolutions_and_gaps_follow_the_clock(tmp_path):
+    hourly = write(tmp_path / "hourly.csv", "timestamp,intensity\n"
+                   "2026-01-01T00:00,100\n2026-01-01T01:00,200\n")
+    # Dopo un buco di un'ora riprende una serie a 30 minuti
+    fine = write(tmp_path / "fine.csv", "timestamp,intensity\n"
+                 "2026-01-01T03:00,5\n2026-01-01T03:30,6\n")
+    store = CarbonForecastStore([hourly, fine], slot_minutes=30)
+    store.refresh()
+    assert store.start == _parse_timestamp("2026-01-01T00:00")
+    assert store.window(current_tick=-1, horizon=8).intensities == [100, 100, 200, 200, 200, 200, 5, 6]
+
+
+def test_refresh_keeps_last_good_series(tmp_path):
+    path = tmp_path / "f.csv"
+    write(path, "timestamp,intensity\n2026-01-01T00:00,10\n2026-01-01T00:30,20\n", mtime=1000)
+    store = CarbonForecastStore([str(path)])
+    assert store.refresh()
+
+    write(path, "timestamp,intensity\n2026-01-01T00:00,not-a-number\n", mtime=2000)
+    assert not store.refresh()
+    assert store.intensities == [10, 20]
+
+    path.unlink()
+    assert not store.refresh()
+    assert store.window(current_tick=-1, horizon=2).intensities == [10, 20]
+
+
+def test_legacy_files_ignored_when_timestamped_series_exist(tmp_path):
+    legacy = write(tmp_path / "co2.csv", "900,900,900")
+    series = write(tmp_path / "f.csv", "timestamp,intensity\n2026-01-01T00:00,10\n2026-01-01T00:30,20\n")
+    store = CarbonForecastStore([legacy, series])
+    store.refresh()
+    assert store.timestamped
+    assert store.intensities == [10, 20]
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from envelope import (
+    CONTENT_TYPE_JSON,
+    CONTENT_TYPE_MSGPACK,
+    decode_message,
+    encode_message,
+    wire_content_type,
+)
+
+MESSAGES = [
+    {
+        "M": {"task": "Question Answering", "question": "Who wrote Hamlet?", "context": "Shakespeare " * 50},
+        "D": 3,
+        "C": "http://localhost:5001/callback",
+        "slot": 12,
+        "strategy": "high",
+    },
+    {"M": "plain echo", "D": 0, "C": "http://localhost:5001/callback"},
+    {"M": {"task": "Unknown task", "sequence": "x"}, "strategy": "custom", "trace_id": "abc"},
+    {"D": 1, "M": None, "slot": None},
+]
+
+
+@pytest.mark.parametrize("data", MESSAGES)
+def test_json_round_trip(data):
+    body, content_type = encode_message(data)
+    assert content_type == CONTENT_TYPE_JSON
+    assert decode_message(body, content_type) == data
+
+
+@pytest.mark.parametrize("data", MESSAGES)
+def test_msgpack_round_trip_matches_json(data):
+    pytest.importorskip("msgpack")
+    body, content_type = encode_message(data, CONTENT_TYPE_MSGPACK)
+    assert content_type == CONTENT_TYPE_MSGPACK
+    assert decode_message(body, content_type) == decode_message(*encode_message(data))
+
+
+def test_messages_without_content_type_are_json():
+    assert decode_message(json.dumps(MESSAGES[1]), None) == MESSAGES[1]
+
+
+def test_wire_format_defaults_to_json():
+    assert wire_content_type({}) == CONTENT_TYPE_JSON
+    with pytest.raises(ValueError):
+        wire_content_type({"wire_format": "xml"})
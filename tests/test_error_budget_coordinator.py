@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("flask")
+
+import error_budget_coordinator as coordinator
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(coordinator, "NUM_SHARDS", 2)
+    monkeypatch.setitem(coordinator.ledger, "slack", 0.0)
+    monkeypatch.setitem(coordinator.ledger, "blocks", 0)
+    monkeypatch.setitem(coordinator.ledger, "error_used", 0)
+    return coordinator.app.test_client()
+
+
+def schedule(client, shard, blocks, error_used):
+    budget = client.post("/budget", json={"shard": shard, "tick": 0, "blocks": blocks}).get_json()
+    client.post("/report", json={
+        "shard": shard,
+        "blocks": blocks,
+        "error_used": error_used,
+        "grant": budget["grant"],
+    })
+    return budget
+
+
+def expected_slack():
+    ledger = coordinator.ledger
+    return coordinator.EPSILON * ledger["blocks"] - ledger["error_used"]
+
+
+def test_unused_budget_is_granted_to_next_shard(client):
+    eps = coordinator.EPSILON
+    schedule(client, 0, 10, (eps - 5) * 10)  # 50 di slack
+    budget = schedule(client, 1, 5, eps * 5)
+    assert budget["grant"] == pytest.approx(25.0)
+    assert budget["epsilon"] == pytest.approx(eps + 5.0)
+    assert coordinator.ledger["slack"] == pytest.approx(expected_slack())
+
+
+def test_overshoot_is_carried_as_debt(client):
+    eps = coordinator.EPSILON
+    schedule(client, 0, 4, eps * 4 + 40)  # sforamento: debito di 40
+    assert coordinator.ledger["slack"] == pytest.approx(-40.0)
+
+    budget = schedule(client, 1, 4, eps * 4 - 20)
+    assert budget["grant"] == pytest.approx(-20.0)
+    assert budget["epsilon"] == pytest.approx(eps - 5.0)
+    assert coordinator.ledger["slack"] == pytest.approx(expected_slack())
+    assert coordinator.ledger["slack"] == pytest.approx(-20.0)
+
+
+def test_slack_matches_ledger_with_outstanding_grants(client):
+    eps = coordinator.EPSILON
+    schedule(client, 0, 6, eps * 6 - 30)
+    outstanding = client.post("/budget", json={"shard": 1, "tick": 1, "blocks": 3}).get_json()["grant"]
+    # Finché lo shard non riporta, la quota concessa manca dallo slack
+    assert coordinator.ledger["slack"] + outstanding == pytest.approx(expected_slack())
+    client.post("/report", json={"shard": 1, "blocks": 3, "error_used": eps * 3 + 50, "grant": outstanding})
+    assert coordinator.ledger["slack"] == pytest.approx(expected_slack())
+    assert coordinator.ledger["slack"] < 0
@@ -0,0 +1,37 @@
+from collections import Counter
+
+from envelope import TASK_CODES
+from sharding import consistent_hash, ingress_queue_name, make_request_id, shard_for_message
+
+
+def test_request_ids_are_unique_across_shards():
+    num_shards = 4
+    ids = [make_request_id(counter, shard, num_shards) for shard in range(num_shards) for counter in range(500)]
+    assert len(set(ids)) == len(ids)
+    assert sorted(ids) == list(range(num_shards * 500))
+
+
+def test_single_shard_keeps_legacy_ids_and_queue():
+    assert [make_request_id(c, 0, 1) for c in range(5)] == [0, 1, 2, 3, 4]
+    assert ingress_queue_name(0, 1) == "ingress_queue"
+    assert ingress_queue_name(2, 3) == "ingress_queue.2"
+
+
+def test_task_partition_spreads_known_tasks():
+    shards = {shard_for_message({"M": {"task": task}}, 3, "task") for task in TASK_CODES}
+    assert shards == {0, 1, 2}
+
+
+def test_task_partition_unknown_task_uses_hash_ring():
+    for task in ("Summarization", "Translation", "Echo"):
+        data = {"M": {"task": task, "sequence": "x"}}
+        assert shard_for_message(data, 5, "task") == consistent_hash(task, 5)
+    assert shard_for_message({"M": "plain echo"}, 5, "task") == consistent_hash("Echo", 5)
+
+
+def test_hash_partition_is_balanced_and_stable():
+    messages = [{"M": {"task": "Text Generation", "sequence": str(i)}} for i in range(4000)]
+    counts = Counter(shard_for_message(m, 4) for m in messages)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 700
+    assert [shard_for_message(m, 4) for m in messages[:50]] == [shard_for_message(m, 4) for m in messages[:50]]
@@ -0,0 +1,112 @@
+import glob
+import os
+import threading
+import time
+
+import pytest
+
+from transport import LocalTransport, Transport
+
+
+def wait_for(drain, count, timeout=2.0):
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count and time.monotonic() < deadline:
+        messages.extend(drain())
+        time.sleep(0.01)
+    return messages
+
+
+def tick_sockets(socket_dir):
+    return glob.glob(os.path.join(socket_dir, "tick.*.sock"))
+
+
+@pytest.fixture
+def socket_dir(tmp_path):
+    return str(tmp_path)
+
+
+def test_transport_is_abstract():
+    with pytest.raises(TypeError):
+        Transport()
+
+
+def test_local_ingress_round_trip(socket_dir):
+    consumer = LocalTransport(socket_dir)
+    consumer.bind_ingress("ingress_queue.1")
+    producer = LocalTransport(socket_dir)
+    try:
+        producer.publish_request("ingress_queue.1", '{"M": "a"}', "application/json")
+        producer.publish_request("ingress_queue.1", b"\x01\x02", None)
+        messages = wait_for(lambda: consumer.drain_ingress("ingress_queue.1"), 2)
+        assert messages == [(b'{"M": "a"}', "application/json"), (b"\x01\x02", None)]
+    finally:
+        producer.close()
+        consumer.close()
+
+
+def test_local_large_message(socket_dir):
+    consumer = LocalTransport(socket_dir)
+    consumer.bind_ingress("ingress_queue")
+    producer = LocalTransport(socket_dir)
+    try:
+        body = b"c" * 300_000
+        producer.publish_request("ingress_queue", body, "application/json")
+        assert wait_for(lambda: consumer.drain_ingress("ingress_queue"), 1) == [(body, "application/json")]
+        with pytest.raises(ValueError):
+            producer.publish_request("ingress_queue", b"c" * (LocalTransport.MAX_MESSAGE + 1), None)
+    finally:
+        producer.close()
+        consumer.close()
+
+
+def test_local_slot_routing(socket_dir):
+    service = LocalTransport(socket_dir)
+    service.bind_slots(3)
+    scheduler = LocalTransport(socket_dir)
+    try:
+        for slot in (0, 2, 2):
+            scheduler.publish_slot(slot, f"slot {slot}", None)
+        assert wait_for(lambda: service.drain_slot(2), 2) == [(b"slot 2", None)] * 2
+        assert wait_for(lambda: service.drain_slot(0), 1) == [(b"slot 0", None)]
+        assert service.drain_slot(1) == []
+    finally:
+        scheduler.close()
+        service.close()
+
+
+def test_local_tick_fanout(socket_dir):
+    received = {0: [], 1: []}
+    subscribers = [LocalTransport(socket_dir) for _ in received]
+    for i, subscriber in enumerate(subscribers):
+        threading.Thread(target=subscriber.consume_ticks, args=(received[i].append,), daemon=True).start()
+    clock = LocalTransport(socket_dir)
+    try:
+        deadline = time.monotonic() + 2.0
+        while len(tick_sockets(socket_dir)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        clock.publish_tick(7)
+        deadline = time.monotonic() + 2.0
+        while any(r != [7] for r in received.values()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert received == {0: [7], 1: [7]}
+    finally:
+        clock.close()
+        for subscriber in subscribers:
+            subscriber.close()
+
+
+def test_publish_without_consumer_fails(socket_dir):
+    producer = LocalTransport(socket_dir)
+    with pytest.raises(ConnectionError):
+        producer.publish_request("ingress_queue", "x", None)
+
+
+def test_second_consumer_is_refused(socket_dir):
+    first = LocalTransport(socket_dir)
+    first.bind_slots(2)
+    try:
+        with pytest.raises(RuntimeError):
+            LocalTransport(socket_dir).bind_slots(2)
+    finally:
+        first.close()
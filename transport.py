@@ -0,0 +1,378 @@
+import glob
+import json
+import os
+import socket
+import struct
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from queue import Queue
+
+# Livello di trasporto usato da frontend, scheduler, service e clock.
+#
+# Copre le tre topologie del sistema:
+# - code di ingresso (frontend → scheduler), una per shard;
+# - fanout dei tick (clock → tutti i componenti);
+# - routing per slot (scheduler → service).
+#
+# Backend disponibili (parametro `transport` in scheduler_config.csv):
+# - "rabbitmq": implementazione storica su RabbitMQ (pika);
+# - "local": single-node senza broker, su socket Unix locali.
+
+TICK_EXCHANGE = "tick_exchange"
+SLOT_EXCHANGE = "slot_exchange"
+
+
+def slot_queue_name(slot):
+    return f"slot_queue_{slot}"
+
+
+class Transport(ABC):
+    """Interfaccia comune ai backend di trasporto."""
+
+    @abstractmethod
+    def publish_request(self, queue, body, content_type):
+        pass
+
+    @abstractmethod
+    def bind_ingress(self, queue):
+        """Registra questo processo come consumer della coda di ingresso."""
+
+    @abstractmethod
+    def drain_ingress(self, queue):
+        """Preleva tutti i messaggi in attesa: lista di (body, content_type)."""
+
+    @abstractmethod
+    def publish_slot(self, slot, body, content_type):
+        pass
+
+    @abstractmethod
+    def bind_slots(self, total_slots):
+        """Registra questo processo come consumer delle code di slot 0..total_slots-1."""
+
+    @abstractmethod
+    def drain_slot(self, slot):
+        pass
+
+    @abstractmethod
+    def publish_tick(self, tick):
+        pass
+
+    @abstractmethod
+    def consume_ticks(self, on_tick):
+        """Bloccante: chiama on_tick(tick) per ogni tick ricevuto."""
+
+    def close(self):
+        pass
+
+
+class RabbitMQTransport(Transport):
+    def __init__(self, host="localhost"):
+        import pika  # importato qui: il backend locale non richiede pika
+        self.pika = pika
+        self.connection = pika.BlockingConnection(pika.ConnectionParameters(host))
+        self.channel = self.connection.channel()
+        self._slot_exchange_declared = False
+
+    def _drain(self, queue):
+        messages = []
+        while True:
+            method, properties, body = self.channel.basic_get(queue=queue, auto_ack=True)
+            if body:
+                messages.append((body, properties.content_type))
+            else:
+                break
+        return messages
+
+    def publish_request(self, queue, body, content_type):
+        self.channel.queue_declare(queue=queue)
+        self.channel.basic_publish(
+            exchange="",
+            routing_key=queue,
+            body=body,
+            properties=self.pika.BasicProperties(content_type=content_type)
+        )
+
+    def bind_ingress(self, queue):
+        self.channel.queue_declare(queue=queue)  # Assicura che esista
+
+    def drain_ingress(self, queue):
+        return self._drain(queue)
+
+    def publish_slot(self, slot, body, content_type):
+        if not self._slot_exchange_declared:
+            self.channel.exchange_declare(exchange=SLOT_EXCHANGE, exchange_type="topic")
+            self._slot_exchange_declared = True
+        self.channel.basic_publish(
+            exchange=SLOT_EXCHANGE,
+            routing_key=f"slot.{slot}",
+            body=body,
+            properties=self.pika.BasicProperties(content_type=content_type)
+        )
+
+    def bind_slots(self, total_slots):
+        self.channel.exchange_declare(exchange=SLOT_EXCHANGE, exchange_type="topic")
+        for i in range(total_slots):
+            queue_name = slot_queue_name(i)
+            self.channel.queue_declare(queue=queue_name)
+            self.channel.queue_bind(exchange=SLOT_EXCHANGE, queue=queue_name, routing_key=f"slot.{i}")
+
+    def drain_slot(self, slot):
+        return self._drain(slot_queue_name(slot))
+
+    def publish_tick(self, tick):
+        self.channel.exchange_declare(exchange=TICK_EXCHANGE, exchange_type="fanout")
+        # Pubblica sul fanout exchange (routing_key vuota)
+        self.channel.basic_publish(exchange=TICK_EXCHANGE, routing_key="", body=json.dumps({"tick": tick}))
+
+    def consume_ticks(self, on_tick):
+        self.channel.exchange_declare(exchange=TICK_EXCHANGE, exchange_type="fanout")
+        # Coda temporanea esclusiva per questo consumer, legata al fanout
+        tick_queue = self.channel.queue_declare(queue="", exclusive=True).method.queue
+        self.channel.queue_bind(exchange=TICK_EXCHANGE, queue=tick_queue)
+
+        def callback(ch, method, properties, body):
+            on_tick(json.loads(body)["tick"])
+
+        self.channel.basic_consume(queue=tick_queue, on_message_callback=callback, auto_ack=True)
+        self.channel.start_consuming()
+
+    def close(self):
+        self.connection.close()
+
+
+class LocalTransport(Transport):
+    """
+    Backend single-node senza broker.
+
+    Ogni coda è un socket Unix stream in `socket_dir`, creato dal suo
+    consumer; i produttori vi si connettono direttamente, senza hop
+    intermedi, e inviano frame con prefisso di lunghezza (nessun limite
+    legato ai buffer dei datagrammi). Un thread per connessione sposta i
+    messaggi in un buffer in memoria, così i produttori non si bloccano tra
+    un tick e l'altro. Il fanout dei tick invia un frame a ogni socket
+    tick.*.sock.
+    """
+
+    MAX_MESSAGE = 16 << 20  # 16 MiB per messaggio
+    _HEADER = struct.Struct("!I")
+
+    def __init__(self, socket_dir="/tmp/carbonshift"):
+        self.socket_dir = socket_dir
+        os.makedirs(socket_dir, exist_ok=True)
+        self.connections = {}  # path → connessione verso il consumer
+        self.buffers = {}
+        self.listeners = []
+        self.accepted = set()  # connessioni aperte dai produttori verso questo processo
+
+    def _path(self, name):
+        return os.path.join(self.socket_dir, f"{name}.sock")
+
+    def _frame(self, body, content_type):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        ct = (content_type or "").encode("ascii")
+        payload = bytes([len(ct)]) + ct + body
+        if len(payload) > self.MAX_MESSAGE:
+            raise ValueError(
+                f"Messaggio di {len(payload)} byte oltre il limite di {self.MAX_MESSAGE} byte del transport locale"
+            )
+        return self._HEADER.pack(len(payload)) + payload
+
+    @staticmethod
+    def _unframe(payload):
+        ct_len = payload[0]
+        content_type = payload[1:1 + ct_len].decode("ascii") or None
+        return payload[1 + ct_len:], content_type
+
+    @staticmethod
+    def _recv_exact(conn, size):
+        chunks = []
+        while size > 0:
+            chunk = conn.recv(min(size, 1 << 16))
+            if not chunk:
+                return None  # connessione chiusa dal produttore
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _serve(self, conn, name, on_message):
+        """Legge i frame di una connessione finché il produttore non la chiude."""
+        try:
+            while True:
+                header = self._recv_exact(conn, self._HEADER.size)
+                if header is None:
+                    return
+                (length,) = self._HEADER.unpack(header)
+                if length > self.MAX_MESSAGE:
+                    print(f"[TRANSPORT] Frame di {length} byte su '{name}' oltre il limite, connessione chiusa")
+                    return
+                payload = self._recv_exact(conn, length)
+                if payload is None:
+                    return
+                on_message(self._unframe(payload))
+        except OSError:
+            return  # connessione interrotta o chiusa da close()
+
+    @staticmethod
+    def _is_live(path):
+        """True se un altro processo sta ancora ascoltando sul socket."""
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+            return True
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        finally:
+            probe.close()
+
+    def _listen(self, name, on_message):
+        path = self._path(name)
+        if os.path.exists(path):
+            if self._is_live(path):
+                raise RuntimeError(
+                    f"'{name}' ha già un consumer attivo in {self.socket_dir}: "
+                    f"un secondo processo gli sottrarrebbe i messaggi"
+                )
+            os.unlink(path)  # socket rimasto da un processo terminato
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen()
+        self.listeners.append((sock, path))
+
+        def serve(conn):
+            with conn:
+                try:
+                    self._serve(conn, name, on_message)
+                finally:
+                    self.accepted.discard(conn)
+
+        def accept():
+            while True:
+                try:
+                    conn, _ = sock.accept()
+                except OSError:
+                    break  # socket chiuso
+                self.accepted.add(conn)
+                threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+        threading.Thread(target=accept, daemon=True).start()
+
+    def _bind_buffered(self, name):
+        if name in self.buffers:
+            return
+        buffer = deque()
+        self.buffers[name] = buffer
+        self._listen(name, buffer.append)
+
+    def _drop_connection(self, path):
+        conn = self.connections.pop(path, None)
+        if conn is not None:
+            conn.close()
+
+    def _send_frame(self, path, frame):
+        # Un solo nuovo tentativo: la connessione in cache può essere stata
+        # chiusa da un consumer riavviato
+        for attempt in range(2):
+            conn = self.connections.get(path)
+            try:
+                if conn is None:
+                    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    self.connections[path] = conn
+                    conn.connect(path)
+                conn.sendall(frame)
+                return
+            except (BrokenPipeError, ConnectionResetError):
+                self._drop_connection(path)
+                if attempt:
+                    raise
+            except OSError:
+                self._drop_connection(path)
+                raise
+
+    def _send(self, name, body, content_type):
+        frame = self._frame(body, content_type)
+        try:
+            self._send_frame(self._path(name), frame)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise ConnectionError(f"Nessun consumer in ascolto su '{name}'") from e
+
+    def _drain(self, name):
+        buffer = self.buffers[name]
+        messages = []
+        while buffer:
+            messages.append(buffer.popleft())
+        return messages
+
+    def publish_request(self, queue, body, content_type):
+        self._send(queue, body, content_type)
+
+    def bind_ingress(self, queue):
+        self._bind_buffered(queue)
+
+    def drain_ingress(self, queue):
+        return self._drain(queue)
+
+    def publish_slot(self, slot, body, content_type):
+        self._send(f"slot.{slot}", body, content_type)
+
+    def bind_slots(self, total_slots):
+        for i in range(total_slots):
+            self._bind_buffered(f"slot.{i}")
+
+    def drain_slot(self, slot):
+        return self._drain(f"slot.{slot}")
+
+    def publish_tick(self, tick):
+        frame = self._frame(json.dumps({"tick": tick}), "application/json")
+        for path in glob.glob(os.path.join(self.socket_dir, "tick.*.sock")):
+            try:
+                self._send_frame(path, frame)
+            except (FileNotFoundError, ConnectionRefusedError):
+                # Subscriber terminato: rimuove il socket orfano
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except OSError as e:
+                print(f"[TRANSPORT] Tick {tick} non consegnato a {path}: {e}")
+
+    def consume_ticks(self, on_tick):
+        ticks = Queue()
+        self._listen(f"tick.{uuid.uuid4().hex}", ticks.put)
+        while True:
+            body, content_type = ticks.get()
+            on_tick(json.loads(body)["tick"])
+
+    def close(self):
+        for path in list(self.connections):
+            self._drop_connection(path)
+        for sock, path in self.listeners:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)  # sblocca il thread in accept()
+            except OSError:
+                pass
+            sock.close()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self.listeners = []
+        for conn in list(self.accepted):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        self.accepted = set()
+
+
+def get_transport(config):
+    """Crea il backend di trasporto configurato in scheduler_config.csv."""
+    backend = config.get("transport", "rabbitmq")
+    if backend == "rabbitmq":
+        return RabbitMQTransport(config.get("rabbitmq_host", "localhost"))
+    if backend == "local":
+        return LocalTransport(config.get("transport_dir", "/tmp/carbonshift"))
+    raise ValueError(f"Transport non supportato: {backend}")